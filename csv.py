@@ -1,7 +1,10 @@
 import os
+import shutil
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import Dict, List, Optional, Union
 
 logger = logging.getLogger(__name__)
 
@@ -20,26 +23,98 @@ def create_directory(date: str, base_dir: str = "data") -> Path:
     dir_path.mkdir(parents=True, exist_ok=True)
     return dir_path
 
-def save_single_csv(data: Union[bytes, str], filepath: Path) -> bool:
+@contextmanager
+def atomic_write(filepath: Path, buffering: int = -1):
+    """
+    Abre um arquivo temporário para escrita binária e o publica em filepath
+    
+    O conteúdo é gravado em '<nome>.part' e renomeado com os.replace ao final,
+    de modo que um CSV incompleto nunca aparece com o nome definitivo. Em caso
+    de erro o arquivo temporário é removido.
+    
+    Args:
+        filepath: Caminho final do arquivo
+        buffering: Tamanho do buffer de escrita (mesmo significado de open)
+        
+    Yields:
+        Arquivo temporário aberto em modo 'wb'
+    """
+    tmp_path = filepath.with_name(filepath.name + ".part")
+    try:
+        with open(tmp_path, 'wb', buffering=buffering) as f:
+            yield f
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+def write_chunks(chunks: List[bytes], filepath: Path) -> int:
+    """
+    Grava uma lista de blocos em um arquivo sem concatená-los antes
+    
+    Usa os.writev para gravar vários blocos por chamada de sistema,
+    tratando escritas parciais e o limite de IOV_MAX por chamada. Em
+    plataformas sem os.writev (ex.: Windows) os blocos são concatenados.
+    
+    Args:
+        chunks: Blocos de bytes na ordem em que devem ser gravados
+        filepath: Caminho completo do arquivo
+        
+    Returns:
+        int: Total de bytes gravados
+    """
+    if not hasattr(os, "writev"):
+        with atomic_write(filepath) as f:
+            return f.write(b''.join(chunks))
+    
+    try:
+        iov_max = os.sysconf("SC_IOV_MAX")
+    except (AttributeError, ValueError, OSError):
+        iov_max = -1
+    if iov_max < 1:
+        # Limite indeterminado: usa o mínimo garantido pelo POSIX
+        iov_max = 1024
+    
+    views = [memoryview(chunk) for chunk in chunks if chunk]
+    with atomic_write(filepath, buffering=0) as f:
+        fd = f.fileno()
+        written = 0
+        i = 0
+        while i < len(views):
+            n = os.writev(fd, views[i:i + iov_max])
+            if not n:
+                raise OSError(f"os.writev não gravou dados em {filepath}")
+            written += n
+            # Avançar pelos blocos gravados (a escrita pode ser parcial)
+            while n:
+                if n >= len(views[i]):
+                    n -= len(views[i])
+                    i += 1
+                else:
+                    views[i] = views[i][n:]
+                    n = 0
+    return written
+
+def save_single_csv(data: Union[bytes, str, List[bytes]], filepath: Path) -> bool:
     """
     Salva dados em um arquivo CSV
     
     Args:
-        data: Dados a serem salvos (bytes ou string)
+        data: Dados a serem salvos (bytes, string ou lista de blocos de bytes)
         filepath: Caminho completo do arquivo
         
     Returns:
         bool: True se salvou com sucesso
     """
     try:
-        if isinstance(data, bytes):
-            with open(filepath, 'wb') as f:
-                f.write(data)
+        if isinstance(data, list):
+            file_size = write_chunks(data, filepath)
         else:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(data)
+            if isinstance(data, str):
+                data = data.encode('utf-8')
+            with atomic_write(filepath) as f:
+                file_size = f.write(data)
         
-        file_size = filepath.stat().st_size
         logger.info(f"Salvo: {filepath.name} ({file_size / (1024*1024):.1f} MB)")
         return True
         
@@ -47,13 +122,19 @@ def save_single_csv(data: Union[bytes, str], filepath: Path) -> bool:
         logger.error(f"Erro ao salvar {filepath}: {e}")
         return False
 
-def save_date_results(date_results: List[Dict], base_dir: str = "data") -> Dict:
+def save_date_results(date_results: List[Dict], base_dir: str = "data", filename_mapping: Optional[Dict[str, str]] = None) -> Dict:
     """
     Salva todos os resultados de uma data específica
     
+    Arquivos já gravados pelos scrapers ('filepath') não são regravados. Se o
+    nome de destino mudar no mesmo diretório da data, o arquivo é renomeado
+    com os.replace e 'filepath' do resultado é atualizado; em outro base_dir,
+    o destino recebe um hard link (ou cópia) e o original é mantido.
+    
     Args:
         date_results: Lista de resultados de scrapers para uma data
         base_dir: Diretório base para salvar
+        filename_mapping: Mapeamento opcional de nomes {"Scraper Name": "custom_filename"}
         
     Returns:
         Dict: Estatísticas de salvamento
@@ -70,6 +151,7 @@ def save_date_results(date_results: List[Dict], base_dir: str = "data") -> Dict:
     
     saved_count = 0
     error_count = 0
+    filename_mapping = filename_mapping or {}
     
     for result in date_results:
         if result.get("status") != "success":
@@ -79,17 +161,48 @@ def save_date_results(date_results: List[Dict], base_dir: str = "data") -> Dict:
         try:
             scraper_name = result.get("scraper", "unknown")
             filename = result.get("filename", scraper_name.lower().replace(" ", "_"))
-            data = result.get("data")
+            filename = filename_mapping.get(scraper_name, filename)
             
+            # Criar nome do arquivo
+            csv_filename = f"{filename}-{date}.csv"
+            filepath = date_dir / csv_filename
+            
+            # Arquivo já gravado pelo scraper: não regravar, apenas conferir o tamanho
+            saved_path = result.get("filepath")
+            if saved_path:
+                saved_path = Path(saved_path)
+                if not saved_path.exists():
+                    logger.warning(f"⚠️  Arquivo não encontrado para {scraper_name}: {saved_path}")
+                    error_count += 1
+                    continue
+                if os.path.samefile(saved_path.parent, date_dir):
+                    # Mesmo diretório: apenas renomeia se o nome mudou
+                    if saved_path.name != filepath.name:
+                        os.replace(saved_path, filepath)
+                        result["filepath"] = str(filepath)
+                elif not (filepath.exists() and os.path.samefile(saved_path, filepath)):
+                    # Outro base_dir: publica por hard link (ou cópia) mantendo o original
+                    filepath.unlink(missing_ok=True)
+                    try:
+                        os.link(saved_path, filepath)
+                    except OSError:
+                        shutil.copyfile(saved_path, filepath)
+                file_size = os.stat(filepath).st_size
+                if not file_size:
+                    logger.warning(f"⚠️  Dados vazios para {scraper_name}")
+                    filepath.unlink(missing_ok=True)
+                    error_count += 1
+                    continue
+                logger.info(f"Salvo: {filepath.name} ({file_size / (1024*1024):.1f} MB)")
+                saved_count += 1
+                continue
+            
+            data = result.get("data")
             if not data:
                 logger.warning(f"⚠️  Dados vazios para {scraper_name}")
                 error_count += 1
                 continue
             
-            # Criar nome do arquivo
-            csv_filename = f"{filename}-{date}.csv"
-            filepath = date_dir / csv_filename
-            
             # Salvar arquivo
             if save_single_csv(data, filepath):
                 saved_count += 1
@@ -109,13 +222,18 @@ def save_date_results(date_results: List[Dict], base_dir: str = "data") -> Dict:
         "directory": str(date_dir)
     }
 
-def save_to_csv(scraper_results: Dict, base_dir: str = "data") -> Dict:
+def save_to_csv(scraper_results: Dict, base_dir: str = "data", filename_mapping: Optional[Dict[str, str]] = None) -> Dict:
     """
     Função principal para salvar todos os resultados do scraper
     
+    Arquivos gravados pelos scrapers são renomeados no próprio diretório
+    quando o nome muda (atualizando 'filepath'); para outro base_dir o destino
+    recebe um hard link (ou cópia) e o original é mantido.
+    
     Args:
         scraper_results: Resultados completos do handler_available_dates_async
         base_dir: Diretório base para salvar (padrão: 'data')
+        filename_mapping: Mapeamento opcional de nomes {"Scraper Name": "custom_filename"}
         
     Returns:
         Dict: Estatísticas completas de salvamento
@@ -131,16 +249,18 @@ def save_to_csv(scraper_results: Dict, base_dir: str = "data") -> Dict:
         logger.warning("Nenhum resultado para salvar")
         return {"status": "no_data", "dates_processed": 0}
     
-    # Processar cada data
+    # Processar cada data em paralelo (cada data tem seu próprio diretório)
     all_stats = []
     total_saved = 0
     total_errors = 0
     
-    for date_results in results_list:
-        stats = save_date_results(date_results, base_dir)
-        all_stats.append(stats)
-        total_saved += stats["saved"]
-        total_errors += stats["errors"]
+    with ThreadPoolExecutor(max_workers=min(8, len(results_list))) as executor:
+        base_dirs = [base_dir] * len(results_list)
+        mappings = [filename_mapping] * len(results_list)
+        for stats in executor.map(save_date_results, results_list, base_dirs, mappings):
+            all_stats.append(stats)
+            total_saved += stats["saved"]
+            total_errors += stats["errors"]
     
     # Resumo final
     dates_processed = len(all_stats)
@@ -166,6 +286,10 @@ def save_with_custom_mapping(scraper_results: Dict, filename_mapping: Dict[str,
     """
     Salva dados com mapeamento customizado de nomes de arquivos
     
+    Para arquivos já gravados pelos scrapers no mesmo base_dir, o mapeamento
+    renomeia o arquivo existente. Prefira passar filename_mapping para
+    handler_available_dates_async, que já grava com o nome final.
+    
     Args:
         scraper_results: Resultados do scraper
         filename_mapping: Mapeamento de nomes {"Scraper Name": "custom_filename"}
@@ -175,20 +299,11 @@ def save_with_custom_mapping(scraper_results: Dict, filename_mapping: Dict[str,
         Dict: Estatísticas de salvamento
     """
     logger.info(f"Salvando com mapeamento customizado: {filename_mapping}")
-    
-    # Temporariamente aplicar mapeamento
-    results_list = scraper_results.get("results", [])
-    for date_results in results_list:
-        for result in date_results:
-            scraper_name = result.get("scraper")
-            if scraper_name in filename_mapping:
-                result["filename"] = filename_mapping[scraper_name]
-    
-    return save_to_csv(scraper_results, base_dir)
+    return save_to_csv(scraper_results, base_dir, filename_mapping=filename_mapping)
 
 # Funções utilitárias
 
-def list_saved_files(base_dir: str = "data") -> Dict:
+def list_saved_files(base_dir: str = "data", include_filenames: bool = True) -> Dict:
     """Lista todos os arquivos salvos organizados por data"""
     base_path = Path(base_dir)
     
@@ -198,18 +313,32 @@ def list_saved_files(base_dir: str = "data") -> Dict:
     dates_info = []
     total_files = 0
     
-    for date_dir in base_path.iterdir():
-        if date_dir.is_dir():
-            files = list(date_dir.glob("*.csv"))
-            total_size = sum(f.stat().st_size for f in files)
+    # os.scandir reaproveita o tipo/stat lidos com o diretório
+    with os.scandir(base_path) as date_entries:
+        for date_entry in date_entries:
+            if not date_entry.is_dir():
+                continue
+            
+            file_count = 0
+            total_size = 0
+            filenames = []
+            with os.scandir(date_entry.path) as file_entries:
+                for file_entry in file_entries:
+                    if file_entry.name.endswith(".csv"):
+                        file_count += 1
+                        total_size += file_entry.stat().st_size
+                        if include_filenames:
+                            filenames.append(file_entry.name)
             
-            dates_info.append({
-                "date": date_dir.name,
-                "files": len(files),
-                "total_size_mb": round(total_size / (1024*1024), 1),
-                "filenames": [f.name for f in files]
-            })
-            total_files += len(files)
+            date_info = {
+                "date": date_entry.name,
+                "files": file_count,
+                "total_size_mb": round(total_size / (1024*1024), 1)
+            }
+            if include_filenames:
+                date_info["filenames"] = filenames
+            dates_info.append(date_info)
+            total_files += file_count
     
     return {
         "directories": len(dates_info),
@@ -225,24 +354,32 @@ def cleanup_old_files(base_dir: str = "data", keep_days: int = 30) -> Dict:
     if not base_path.exists():
         return {"removed": 0, "kept": 0}
     
-    cutoff_date = datetime.now() - timedelta(days=keep_days)
+    # Datas YYYY-MM-DD ordenam como texto, então basta comparar strings
+    cutoff_str = (datetime.now() - timedelta(days=keep_days)).strftime("%Y-%m-%d")
     removed = 0
     kept = 0
     
-    for date_dir in base_path.iterdir():
-        if date_dir.is_dir():
+    with os.scandir(base_path) as entries:
+        for entry in entries:
+            name = entry.name
+            if not entry.is_dir():
+                continue
+            if not (len(name) == 10 and name[4] == '-' and name[7] == '-'):
+                # Nome de diretório inválido, pular
+                continue
             try:
-                dir_date = datetime.strptime(date_dir.name, "%Y-%m-%d")
-                if dir_date < cutoff_date:
-                    import shutil
-                    shutil.rmtree(date_dir)
-                    logger.info(f"Removido diretório antigo: {date_dir.name}")
-                    removed += 1
-                else:
-                    kept += 1
+                # Rejeita dígitos inválidos e meses/dias impossíveis (ex.: 2024-13-99)
+                datetime.fromisoformat(name)
             except ValueError:
-                # Nome de diretório inválido, pular
                 continue
+            
+            if name <= cutoff_str:
+                # rmtree já remove via descritores de diretório (dir_fd) onde suportado
+                shutil.rmtree(entry.path)
+                logger.info(f"Removido diretório antigo: {name}")
+                removed += 1
+            else:
+                kept += 1
     
     return {"removed": removed, "kept": kept}
 
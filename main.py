@@ -1,15 +1,23 @@
 import aiohttp
 import asyncio
 import logging
+import ssl
 from datetime import datetime, timedelta
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 from scrapers import fetch_earnings, fetch_daily_trades, fetch_open_interest, fetch_series, fetch_consolidated_trade_info, available_dates
-from csv import save_to_csv
+from csv import save_date_results, create_directory
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+ssl_context = ssl.create_default_context()
+
 holidays = ["2024-01-01", "2024-02-12", "2024-02-13", "2024-03-29", "2024-05-01", "2024-05-30", "2024-11-15", "2024-11-20", "2024-12-24", "2024-12-25", "2024-12-31"]
 scrapers = [
     {"name": "Series", "scraper": fetch_series, "bucket_name": "series-csvs", "filename": "series"},
@@ -19,37 +27,43 @@ scrapers = [
     {"name": "Daily trades", "scraper": fetch_daily_trades, "bucket_name": "trades-csvs", "filename": "daily_trades"}
     ]
 
-async def single_scraper(session: aiohttp.ClientSession, scraper: Dict, date: str):
+async def single_scraper(session: aiohttp.ClientSession, scraper: Dict, date: str, base_dir: str = "data", filename_mapping: Optional[Dict[str, str]] = None):
     """
     Executa um scraper específico para uma data e lida com erros.
+    O scraper grava os dados diretamente no arquivo CSV de destino.
 
     Args:
         session (aiohttp.ClientSession): A sessão aiohttp para a requisição.
         scraper (Dict): Um dicionário contendo o nome, a função scraper e o nome
                         do arquivo a ser salvo.
         date (str): A data no formato 'YYYY-MM-DD' para o scraping.
+        base_dir (str): Diretório base onde os CSVs são gravados.
+        filename_mapping (Optional[Dict[str, str]]): Mapeamento opcional de nomes
+                        {"Scraper Name": "custom_filename"}.
 
     Returns:
-        Dict: Um dicionário com o status da execução, dados obtidos e
-              informações sobre o scraper e a data.
+        Dict: Um dicionário com o status da execução, o caminho do arquivo
+              gravado e informações sobre o scraper e a data.
     """
     try: 
         logger.info(f"Executando {scraper['name']} para {date}")
-        scraped_data = await scraper["scraper"](session, date)
+        filename = (filename_mapping or {}).get(scraper["name"], scraper["filename"])
+        filepath = create_directory(date, base_dir) / f"{filename}-{date}.csv"
+        saved_path = await scraper["scraper"](session, date, filepath)
         logger.info(f"{scraper['name']} concluído para {date}")
         return {
             "scraper": scraper["name"], 
             "date": date, 
             "status": "success", 
-            "data": scraped_data,
-            "filename": scraper["filename"],
+            "filepath": str(saved_path),
+            "filename": filename,
             "error": None
         }
     except Exception as e:
         logger.error(f"Erro em {scraper['name']} para {date}: {e}")
         return {"scraper": scraper["name"], "date": date, "status": "error", "error": str(e)}
 
-async def single_date(session: aiohttp.ClientSession, date: str, scrapers_list: List[Dict]) -> List[Dict]:
+async def single_date(session: aiohttp.ClientSession, date: str, scrapers_list: List[Dict], base_dir: str = "data", filename_mapping: Optional[Dict[str, str]] = None) -> List[Dict]:
     """
     Executa todos os scrapers de uma lista para uma data específica em paralelo.
 
@@ -57,12 +71,15 @@ async def single_date(session: aiohttp.ClientSession, date: str, scrapers_list:
         session (aiohttp.ClientSession): A sessão aiohttp para as requisições.
         date (str): A data no formato 'YYYY-MM-DD' para a execução dos scrapers.
         scrapers_list (List[Dict]): Uma lista de dicionários de scrapers a serem executados.
+        base_dir (str): Diretório base onde os CSVs são gravados.
+        filename_mapping (Optional[Dict[str, str]]): Mapeamento opcional de nomes
+                        {"Scraper Name": "custom_filename"}.
 
     Returns:
         List[Dict]: Uma lista de dicionários contendo os resultados de cada scraper.
     """
     logger.info(f"Iniciando scraping para {date}")
-    tasks = [single_scraper(session, scraper, date) for scraper in scrapers_list]
+    tasks = [single_scraper(session, scraper, date, base_dir, filename_mapping) for scraper in scrapers_list]
     results = await asyncio.gather(*tasks, return_exceptions=True)
     processed_results = []
     for result in results:
@@ -79,24 +96,58 @@ async def single_date(session: aiohttp.ClientSession, date: str, scrapers_list:
     logger.info(f"Scraping concluído para {date}")
     return processed_results
 
+async def date_saver(queue: asyncio.Queue, base_dir: str = "data") -> List[Dict]:
+    """
+    Salva os resultados de cada data assim que ficam prontos.
 
-async def handler_available_dates_async(max_dates: int = 7) -> Dict:
+    Consome a fila até receber `None`, executando `save_date_results` em uma
+    thread para que a escrita em disco ocorra junto com os downloads restantes.
+
+    Args:
+        queue (asyncio.Queue): Fila com as listas de resultados de cada data.
+        base_dir (str): Diretório base para salvar.
+
+    Returns:
+        List[Dict]: As estatísticas de salvamento de cada data.
+    """
+    loop = asyncio.get_running_loop()
+    all_stats = []
+    while True:
+        date_results = await queue.get()
+        if date_results is None:
+            break
+        stats = await loop.run_in_executor(None, save_date_results, date_results, base_dir)
+        all_stats.append(stats)
+    return all_stats
+
+async def handler_available_dates_async(max_dates: int = 7, base_dir: str = "data", filename_mapping: Optional[Dict[str, str]] = None) -> Dict:
     """
     Handler assíncrono principal que coordena o scraping para múltiplas datas.
 
     Busca as datas úteis disponíveis e executa todos os scrapers para cada uma
-    dessas datas, respeitando um limite máximo de dias.
+    dessas datas, respeitando um limite máximo de dias. Cada data é salva assim
+    que seus scrapers terminam.
 
     Args:
         max_dates (int): O número máximo de datas a serem processadas.
+        base_dir (str): Diretório base onde os CSVs são gravados.
+        filename_mapping (Optional[Dict[str, str]]): Mapeamento opcional de nomes
+                        {"Scraper Name": "custom_filename"}, aplicado já na gravação.
 
     Returns:
         Dict: Um dicionário de resumo contendo o status da execução, as datas
-              processadas e os resultados de cada scraping.
+              processadas, os resultados de cada scraping e as estatísticas
+              de salvamento.
     """
     logger.info(f"Iniciando scraper para múltiplas datas...")
     
-    connector = aiohttp.TCPConnector(limit=20, limit_per_host=10)
+    connector = aiohttp.TCPConnector(
+        limit=40,
+        limit_per_host=20,
+        ttl_dns_cache=600,
+        keepalive_timeout=75,
+        ssl=ssl_context
+    )
     timeout = aiohttp.ClientTimeout(total=60)
     
     async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
@@ -112,15 +163,37 @@ async def handler_available_dates_async(max_dates: int = 7) -> Dict:
             tasks = []
             for date_info in dates_to_process:
                 date_str = date_info[:10] 
-                task = single_date(session, date_str, scrapers)
+                task = asyncio.create_task(single_date(session, date_str, scrapers, base_dir, filename_mapping))
                 tasks.append(task)
-            all_results = await asyncio.gather(*tasks)
+            
+            queue = asyncio.Queue()
+            saver = asyncio.create_task(date_saver(queue, base_dir))
+            total_success = 0
+            total_errors = 0
+            try:
+                for next_date in asyncio.as_completed(tasks):
+                    date_results = await next_date
+                    for result in date_results:
+                        if result["status"] == "success":
+                            total_success += 1
+                        elif result["status"] == "error":
+                            total_errors += 1
+                    await queue.put(date_results)
+            finally:
+                # Em caso de erro, cancela as datas pendentes e aguarda o saver
+                # terminar antes de a sessão ser fechada
+                await queue.put(None)
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(saver, *tasks, return_exceptions=True)
+            # O saver registra as datas na ordem de conclusão; reordena como em `tasks`
+            date_order = {date_info[:10]: i for i, date_info in enumerate(dates_to_process)}
+            save_stats = sorted(saver.result(), key=lambda stats: date_order.get(stats["date"], len(date_order)))
+            all_results = [task.result() for task in tasks]
             
         except Exception as e:
             logger.error(f"Erro ao obter datas: {e}")
             return {"status": "error", "error": str(e)}
-    total_success = sum(sum(1 for r in date_results if r["status"] == "success") for date_results in all_results)
-    total_errors = sum(sum(1 for r in date_results if r["status"] == "error") for date_results in all_results)
     
     logger.info(f"Resumo geral: {total_success} sucessos, {total_errors} erros em {len(all_results)} datas")
     
@@ -128,21 +201,25 @@ async def handler_available_dates_async(max_dates: int = 7) -> Dict:
         "status": "completed",
         "dates_processed": len(all_results),
         "results": all_results,
-        "summary": {"total_success": total_success, "total_errors": total_errors}
+        "summary": {"total_success": total_success, "total_errors": total_errors},
+        "save_stats": save_stats
     }
 
 async def main():
     """
     Função principal que inicia a execução do scraping.
 
-    Coordena a execução do `handler_available_dates_async` e salva os resultados
-    em um arquivo CSV.
+    Coordena a execução do `handler_available_dates_async`, que salva os
+    resultados de cada data em arquivos CSV.
     """
     result = await handler_available_dates_async(max_dates=7)
-    save_stats = save_to_csv(result)
+    save_stats = result.get("save_stats", [])
     logger.info(f"Dados salvos: {save_stats}")
     logger.info("Execução finalizada")
     return result
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if uvloop is not None:
+        uvloop.run(main())
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -3,50 +3,92 @@ import asyncio
 from datetime import datetime
 from typing import Any
 
-import json
+import orjson
+import shutil
 from io import BytesIO
+from pathlib import Path
 from zipfile import ZipFile
 
+from csv import atomic_write
 from formatters import earnings_formatter
 
-async def fetch_earnings(session: aiohttp.ClientSession, date: str) -> Any:
+__all__ = [
+    "fetch_earnings",
+    "fetch_daily_trades",
+    "fetch_open_interest",
+    "fetch_series",
+    "fetch_consolidated_trade_info",
+    "available_dates",
+]
+
+_TAB_TO_COMMA = bytes.maketrans(b'\t', b',')
+
+def extract_first_file(buffer: BytesIO, filepath: Path) -> Path:
+    """
+    Extrai o primeiro arquivo de um ZIP em memória diretamente para o disco.
+
+    Args:
+        buffer (BytesIO): O conteúdo do arquivo ZIP.
+        filepath (Path): Caminho do arquivo de destino.
+
+    Returns:
+        Path: O caminho do arquivo extraído.
+    """
+    with ZipFile(buffer) as thezip:
+        with thezip.open(thezip.namelist()[0]) as src, atomic_write(filepath, buffering=1 << 20) as dst:
+            shutil.copyfileobj(src, dst, length=1 << 16)
+    return filepath
+
+async def fetch_earnings(session: aiohttp.ClientSession, date: str, filepath: Path) -> Path:
     """
     Busca os dados de proventos na B3 para uma data específica.
 
     Args:
         session (aiohttp.ClientSession): A sessão aiohttp para a requisição.
         date (str): A data no formato 'YYYY-MM-DD' para a qual buscar os dados.
+        filepath (Path): Caminho do arquivo CSV de destino.
 
     Returns:
-        Any: Os dados de proventos formatados, conforme processado por `earnings_formatter`.
+        Path: O caminho do arquivo salvo com os dados formatados por `earnings_formatter`.
     """
     data = {"Name":"ProventionCreditVariable", "Date":date, "FinalDate":date, "ClientId":"", "Filters":{}}
     async with session.post("https://arquivos.b3.com.br/bdi/table/export/csv?sort=TckrSymb&lang=pt-BR", json=data) as response:
         content = await response.read()
         earnings_info = earnings_formatter(content)
-        return earnings_info
+        with atomic_write(filepath) as f:
+            f.write(earnings_info)
+        return filepath
 
-async def fetch_daily_trades(session: aiohttp.ClientSession, date: str) -> Any:
+async def fetch_daily_trades(session: aiohttp.ClientSession, date: str, filepath: Path) -> Path:
     """
     Baixa os dados de negociação diária (trades) da B3 para uma data específica.
+    O CSV é extraído do ZIP diretamente para o arquivo de destino em uma thread,
+    sem carregar o conteúdo descompactado em memória nem bloquear o event loop.
 
     Args:
         session (aiohttp.ClientSession): A sessão aiohttp para a requisição.
         date (str): A data no formato 'YYYY-MM-DD' para a qual buscar os dados.
+        filepath (Path): Caminho do arquivo CSV de destino.
 
     Returns:
-        Any: O conteúdo do arquivo de negociações em formato binário.
+        Path: O caminho do arquivo de negociações salvo.
     """
     timeout = aiohttp.ClientTimeout(total=600, sock_read=60)
     async with session.get(f"https://arquivos.b3.com.br/rapinegocios/tickercsv/{date}", timeout=timeout) as response:
         buffer = BytesIO()
-        async for chunk in response.content.iter_chunked(8192):
+        if response.content_length:
+            # Reserva o buffer inteiro de uma vez; os chunks são gravados no lugar
+            buffer.seek(response.content_length - 1)
+            buffer.write(b'\0')
+            buffer.seek(0)
+        async for chunk in response.content.iter_chunked(65536):
             buffer.write(chunk)
-        buffer.seek(0)
-        with ZipFile(buffer) as thezip:
-            return thezip.read(thezip.namelist()[0])
-        
-async def fetch_open_interest(session: aiohttp.ClientSession, date: str) -> Any:
+        buffer.truncate()
+    buffer.seek(0)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, extract_first_file, buffer, filepath)
+
+async def fetch_open_interest(session: aiohttp.ClientSession, date: str, filepath: Path) -> Path:
     """
     Busca o 'open interest' (posições em aberto) de derivativos na B3.
     É importante notar que o 'open interest' é sempre para D-1.
@@ -54,57 +96,64 @@ async def fetch_open_interest(session: aiohttp.ClientSession, date: str) -> Any:
     Args:
         session (aiohttp.ClientSession): A sessão aiohttp para a requisição.
         date (str): A data no formato 'YYYY-MM-DD' para a qual buscar os dados.
+        filepath (Path): Caminho do arquivo CSV de destino.
 
     Returns:
-        Any: O conteúdo do arquivo de 'open interest' como uma string formatada.
+        Path: O caminho do arquivo de 'open interest' salvo.
     """
     async with session.get(f"https://arquivos.b3.com.br/api/download/requestname?fileName=DerivativesOpenPositionFile&date={date}&recaptchaToken=") as response:
         content = await response.read()
-        response_content = json.loads(content.decode())
+        response_content = orjson.loads(content)
         token = response_content["token"]
     async with session.get(f"https://arquivos.b3.com.br/api/download/?token={token}") as response:
-        content = await response.read()
-        open_interest = content.decode('utf-8').replace('\t', ',').replace('\r', '')
-        return open_interest
+        with atomic_write(filepath) as f:
+            async for chunk in response.content.iter_chunked(65536):
+                f.write(chunk.translate(_TAB_TO_COMMA, delete=b'\r'))
+        return filepath
 
-async def fetch_series(session: aiohttp.ClientSession, date: str) -> Any:
+async def fetch_series(session: aiohttp.ClientSession, date: str, filepath: Path) -> Path:
     """
     Busca informações consolidadas de séries de instrumentos (ativos) na B3.
 
     Args:
         session (aiohttp.ClientSession): A sessão aiohttp para a requisição.
         date (str): A data no formato 'YYYY-MM-DD' para a qual buscar os dados.
+        filepath (Path): Caminho do arquivo CSV de destino.
 
     Returns:
-        Any: O conteúdo do arquivo de séries em formato binário.
+        Path: O caminho do arquivo de séries salvo.
     """
     async with session.get(f"https://arquivos.b3.com.br/api/download/requestname?fileName=InstrumentsConsolidatedFile&date={date}&recaptchaToken=") as response:
         content = await response.read()
-        response_content = json.loads(content.decode())
+        response_content = orjson.loads(content)
         token = response_content["token"]
     async with session.get(f"https://arquivos.b3.com.br/api/download/?token={token}") as response:
-        series = await response.read()
-        return series
+        with atomic_write(filepath) as f:
+            async for chunk in response.content.iter_chunked(65536):
+                f.write(chunk)
+        return filepath
 
-async def fetch_consolidated_trade_info(session: aiohttp.ClientSession, date: str) -> Any:
+async def fetch_consolidated_trade_info(session: aiohttp.ClientSession, date: str, filepath: Path) -> Path:
     """
     Busca informações de negociação consolidadas na B3 para uma data específica.
 
     Args:
         session (aiohttp.ClientSession): A sessão aiohttp para a requisição.
         date (str): A data no formato 'YYYY-MM-DD' para a qual buscar os dados.
+        filepath (Path): Caminho do arquivo CSV de destino.
 
     Returns:
-        Any: O conteúdo do arquivo de informações de negociação consolidadas.
+        Path: O caminho do arquivo de informações de negociação consolidadas salvo.
     """
     async with session.get(f"https://arquivos.b3.com.br/api/download/requestname?fileName=TradeInformationConsolidatedFile&date={date}&recaptchaToken=") as response:
         content = await response.read()
-        response_content = json.loads(content.decode())
+        response_content = orjson.loads(content)
         token = response_content["token"]
     async with session.get(f"https://arquivos.b3.com.br/api/download/?token={token}") as response:
-        content = await response.read()
-        consolidated_trade_info = content.decode('utf-8').replace('\t', ',').replace('\r', '')
-        return consolidated_trade_info
+        with atomic_write(filepath) as f:
+            async for chunk in response.content.iter_chunked(65536):
+                f.write(chunk.translate(_TAB_TO_COMMA, delete=b'\r'))
+        return filepath
 
 async def available_dates(session: aiohttp.ClientSession) -> Any:
     """
@@ -120,5 +169,5 @@ async def available_dates(session: aiohttp.ClientSession) -> Any:
     today = today.strftime('%Y-%m-%d')
     async with session.get(f"https://arquivos.b3.com.br/bdi/table/workdays?date={today}") as response:
         content = await response.read()
-        response_content = json.loads(content.decode())
+        response_content = orjson.loads(content)
         return response_content[1:-1]
\ No newline at end of file